@@ -0,0 +1,206 @@
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from SA import rank_array, suffix_array
+from VARINT import decode_varint, encode_varint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STREAM_LENGTH = 1 << 14
+BLOCKS_PER_WORKER = 2
+
+def bwt_compress(data, stream_length=STREAM_LENGTH):
+    # последний столбец отсортированных циклических сдвигов и номера строк, с
+    # которых начинаются куски исходных данных по stream_length байт; первая -
+    # строка с исходными данными, по остальным распаковка идёт параллельно
+    n = len(data)
+    if n == 0:
+        return b'', [0]
+    sa = suffix_array(data, cyclic=True)
+    streams = max(1, n // stream_length)
+    starts = [n * stream // streams for stream in range(streams)]
+
+    if np is not None:
+        sa = np.frombuffer(sa, dtype=np.int32)
+        last_column_bwt = np.frombuffer(bytes(data), dtype=np.uint8)[sa - 1].tobytes()
+        rank = np.empty(n, dtype=np.int32)
+        rank[sa] = np.arange(n, dtype=np.int32)
+        return last_column_bwt, rank[starts].tolist()
+
+    last_column_bwt = bytes([data[i - 1] for i in sa])
+    rank = rank_array(sa)
+    return last_column_bwt, [rank[start] for start in starts]
+
+def pack_block_header(block, s_indices):
+    # заголовок блока: длина, число потоков и их начальные строки (первая -
+    # номер исходной строки), crc32 исходных данных
+    head = encode_varint(len(block)) + encode_varint(len(s_indices))
+    for s_index in s_indices:
+        head += encode_varint(s_index)
+    return head + zlib.crc32(block).to_bytes(4, byteorder='little')
+
+def parse_block_header(data, index):
+    block_length, index = decode_varint(data, index)
+    streams, index = decode_varint(data, index)
+    if not 1 <= streams <= max(block_length, 1):
+        raise ValueError(f"{streams} BWT streams for a {block_length}-byte block")
+    s_indices = []
+    for _ in range(streams):
+        s_index, index = decode_varint(data, index)
+        if s_index >= max(block_length, 1):
+            raise ValueError(f"BWT row {s_index} is out of a {block_length}-byte block")
+        s_indices.append(s_index)
+    crc = int.from_bytes(data[index:index + 4], byteorder='little')
+    return block_length, s_indices, crc, index + 4
+
+def check_block(block, crc):
+    if zlib.crc32(block) != crc:
+        raise ValueError("BWT block checksum mismatch")
+
+def check_length(data, block_length):
+    # дешёвая проверка до обратного BWT: длина раскодированного столбца
+    if len(data) != block_length:
+        raise ValueError(f"BWT block decodes to {len(data)} bytes, header says {block_length}")
+
+def map_blocks(function, blocks, workers=1):
+    # блоки независимы: при workers > 1 они обрабатываются пулом процессов, в
+    # работе одновременно не больше BLOCKS_PER_WORKER блоков на процесс, чтобы
+    # не читать весь файл в память; результаты отдаются в исходном порядке
+    if workers <= 1:
+        yield from map(function, blocks)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for block in blocks:
+            if len(pending) >= workers * BLOCKS_PER_WORKER:
+                yield pending.popleft().result()
+            pending.append(executor.submit(function, block))
+        while pending:
+            yield pending.popleft().result()
+
+def write_blocks(output_file, code_blocks):
+    # за блоками - таблица их длин (смещение блока - сумма длин предыдущих),
+    # её длина и crc32; по таблице любой блок находится без разбора остальных
+    lengths = []
+    for code_block in code_blocks:
+        output_file.write(code_block)
+        lengths.append(len(code_block))
+    table = encode_varint(len(lengths))
+    for length in lengths:
+        table += encode_varint(length)
+    output_file.write(table + len(table).to_bytes(4, byteorder='little')
+                      + zlib.crc32(table).to_bytes(4, byteorder='little'))
+
+def split_blocks(data):
+    table_length = int.from_bytes(data[-8:-4], byteorder='little')
+    table_start = len(data) - 8 - table_length
+    if table_start < 0 or zlib.crc32(data[table_start:-8]) != int.from_bytes(data[-4:], byteorder='little'):
+        raise ValueError("BWT block table is missing or damaged")
+    count, index = decode_varint(data, table_start)
+    blocks = []
+    offset = 0
+    for _ in range(count):
+        length, index = decode_varint(data, index)
+        blocks.append(data[offset:offset + length])
+        offset += length
+    if offset != table_start:
+        raise ValueError("BWT block table does not match the archive")
+    return blocks
+
+def scan_blocks(data, block_end):
+    # без таблицы блоки находятся по своим заголовкам один за другим;
+    # block_end(data, index) - конец блока, начатого в index; хвост, который
+    # не разбирается как блок, отдаётся последним куском, чтобы его потеря
+    # была видна
+    blocks = []
+    index = 0
+    while index < len(data):
+        try:
+            end = block_end(data, index)
+        except (ValueError, IndexError):
+            end = len(data) + 1
+        if end > len(data):
+            blocks.append(data[index:])
+            break
+        blocks.append(data[index:end])
+        index = end
+    return blocks
+
+def decompress_blocks(output_file, data, decompress_block, workers=1, recover=False, block_end=None):
+    # блоки распаковываются независимо и пишутся по порядку; при recover
+    # испорченный блок пропускается, возвращаются номера пропущенных блоков,
+    # а без таблицы (оборванный архив) блоки ищутся по заголовкам
+    try:
+        blocks = split_blocks(data)
+    except ValueError:
+        if not recover or block_end is None:
+            raise
+        blocks = scan_blocks(data, block_end)
+    if recover:
+        decompress_block = partial(try_block, decompress_block)
+    damaged = []
+    for number, original_block in enumerate(map_blocks(decompress_block, blocks, workers)):
+        if original_block is None:
+            damaged.append(number)
+        else:
+            output_file.write(original_block)
+    return damaged
+
+def try_block(function, block):
+    # при восстановлении любая ошибка разбора - это испорченный блок
+    try:
+        return function(block)
+    except Exception:
+        return None
+
+def bwt_decompress(last_column_BWM, s_indices):
+    # LF-отображение: T[k] - строка, в последнем столбце которой стоит k-й символ
+    # первого столбца; каждый поток идёт по T от своей начальной строки и
+    # заполняет свой кусок заранее выделенного буфера
+    n = len(last_column_BWM)
+    streams = len(s_indices)
+    if n == 0:
+        return b''
+    starts = [n * stream // streams for stream in range(streams)] + [n]
+
+    if np is not None and streams > 1:
+        L = np.frombuffer(bytes(last_column_BWM), dtype=np.uint8)
+        T = np.argsort(L, kind='stable')
+        lengths = np.diff(starts)
+        j = np.array(s_indices, dtype=np.int64)
+        original_S = np.empty((streams, int(lengths.max())), dtype=np.uint8)
+        for step in range(original_S.shape[1]):
+            j = T[j]
+            original_S[:, step] = L[j]
+        return original_S[np.arange(original_S.shape[1]) < lengths[:, None]].tobytes()
+
+    if np is not None:
+        T = np.argsort(np.frombuffer(bytes(last_column_BWM), dtype=np.uint8), kind='stable').tolist()
+    else:
+        T = counting_sort_arg(last_column_BWM)
+    original_S = bytearray(n)
+    for stream, j in enumerate(s_indices):
+        for position in range(starts[stream], starts[stream + 1]):
+            j = T[j]
+            original_S[position] = last_column_BWM[j]
+    return bytes(original_S)
+
+def counting_sort_arg(S):
+    P = [0] * 256
+    for s in S:
+        P[s] += 1
+
+    T_sub = [0] * 256
+    for j in range(1, 256):
+        T_sub[j] = T_sub[j - 1] + P[j - 1]
+
+    T = [-1] * len(S)
+    for i in range(len(S)):
+        T[T_sub[S[i]]] = i
+        T_sub[S[i]] += 1
+    return T
@@ -1,74 +1,72 @@
-from queue import PriorityQueue
+import sys
+from array import array
+from collections import Counter, deque
 
-class Node:
-    def __init__(self, symbol = None, freq = 0, bit0 = None, bit1 = None):
-        if bit0 is not None and bit1 is not None:
-            self._bit0 = bit0
-            self._bit1 = bit1
-            self._freq = bit0.freq + bit1.freq
-            self._symbol = None
-        else:
-            self._symbol = symbol
-            self._freq = freq
-            self._bit0 = None
-            self._bit1 = None
-
-    @property
-    def symbol(self):
-        return self._symbol
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-    @property
-    def freq(self):
-        return self._freq
+TABLE_BITS = 12
+FLUSH_BITS = 512
+PAIR_TABLE_LENGTH = 1 << 17
 
-    @property
-    def bit0(self):
-        return self._bit0
-
-    @property
-    def bit1(self):
-        return self._bit1
+class Node:
+    __slots__ = ('symbol', 'freq', 'bit0', 'bit1')
 
-    def __lt__(self, other):
-        return self.freq < other.freq
+    def __init__(self, symbol = None, freq = 0, bit0 = None, bit1 = None):
+        if bit0 is not None and bit1 is not None:
+            freq = bit0.freq + bit1.freq
+        self.symbol = symbol
+        self.freq = freq
+        self.bit0 = bit0
+        self.bit1 = bit1
 
 
-def ha_compress_file(data_filename, arch_filename):
+def ha_compress_file(data_filename, arch_filename, max_code_length=None):
     with open(data_filename, 'rb') as data_file:
         data = data_file.read()
     if len(data) == 0: return 1
-    arch = compress_bytes(data)
+    arch = compress_bytes(data, max_code_length)
     with open(arch_filename, 'wb') as arch_file:
         arch_file.write(arch)
 
-def compress_bytes(data):
+def compress_bytes(data, max_code_length=None):
+    if len(data) == 0:
+        return bytes(create_header(0, [0] * 256))
     freqs = calculate_freqs(data)
-    head = create_header(len(data), freqs)
-    root = create_huffman_tree(freqs)
-    codes = create_huffman_code(root)
+    if max_code_length is None:
+        root = create_huffman_tree(freqs)
+        lengths = create_code_lengths(root)
+    else:
+        lengths = create_limited_code_lengths(freqs, max_code_length)
+    head = create_header(len(data), lengths)
+    codes = create_canonical_code(lengths)
     bits = compress(data, codes)
 
     return head + bytes(bits)
 
 def calculate_freqs(data):
-    freqs = {}
-    for byte in data:
-        if byte in freqs:
-            freqs[byte] += 1
-        else: freqs[byte] = 1
-    normalize_freqs(freqs)
-    return list(freqs.items())
-
-def normalize_freqs(freqs):
-    max_freq = max(freqs)
-    if max_freq <= 255:
-        return
-
-    for j in range(256):
-        if freqs[j] > 0:
-            freqs[j] = 1 + freqs[j] * 255 // (max_freq + 1)
-
-def create_header(data_length, freqs):
+    counts = count_bytes(data)
+    return [(byte, count) for byte, count in enumerate(counts) if count > 0]
+
+def count_bytes(data, counts=None):
+    # гистограмма очередного куска данных добавляется к counts,
+    # так что поток можно считать по блокам без склейки
+    if counts is None:
+        counts = [0] * 256
+
+    if np is not None and isinstance(data, (bytes, bytearray, memoryview)):
+        histogram = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        for byte, count in enumerate(histogram.tolist()):
+            counts[byte] += count
+    else:
+        for byte, count in Counter(data).items():
+            counts[byte] += count
+
+    return counts
+
+def create_header(data_length, lengths):
     head = bytearray()
 
     head.append(data_length & 0xFF)
@@ -76,68 +74,171 @@ def create_header(data_length, freqs):
     head.append((data_length >> 16) & 0xFF)
     head.append((data_length >> 24) & 0xFF)
 
-    count = len(freqs)
+    return head + pack_code_lengths(lengths)
 
-    head.append(count & 0xFF)
-    head.append((count >> 8) & 0xFF)
+def pack_code_lengths(lengths):
+    head = bytearray()
 
-    for symbol, frequency in freqs:
-        head.append(symbol)
-        if frequency <= 255:
-            head.append(frequency)
-        elif frequency <= 65535:
-            head.append(255)
-            head.extend(frequency.to_bytes(2, byteorder='little'))
+    # длины кодов всех 256 символов: 0b1xxxxxxx - xxxxxxx+1 нулевых длин,
+    # 0b01xxxxxx - повтор предыдущей длины xxxxxx+1 раз, иначе сама длина
+    symbol = 0
+    while symbol < 256:
+        length = lengths[symbol]
+        run = 1
+        while symbol + run < 256 and lengths[symbol + run] == length:
+            run += 1
+
+        if length == 0:
+            run = min(run, 128)
+            head.append(0x80 | (run - 1))
         else:
-            head.append(254)
-            head.extend(frequency.to_bytes(4, byteorder='little'))
+            head.append(length)
+            if run > 1:
+                run = min(run - 1, 64)
+                head.append(0x40 | (run - 1))
+                run += 1
+        symbol += run
 
     return head
 
 def create_huffman_tree(freqs):
-    pq = PriorityQueue()
-
-    for byte, frequency in freqs:
-        pq.put((frequency, Node(symbol=byte, freq=frequency)))
-
-    while pq.qsize() > 1:
-        freq0, bit0 = pq.get()
-        freq1, bit1 = pq.get() 
-        parent = Node(bit0=bit0, bit1=bit1)
-        pq.put((parent.freq, parent))
-
-    return pq.get()[1] 
-
-def create_huffman_code(root):
+    # две очереди: листья по возрастанию (частота, символ) и родители, которые
+    # появляются уже упорядоченными; при равенстве первым берётся лист
+    leaves = deque(Node(symbol=byte, freq=frequency)
+                   for byte, frequency in sorted(freqs, key=lambda item: (item[1], item[0])))
+    parents = deque()
+
+    while len(leaves) + len(parents) > 1:
+        bit0 = _pop_min(leaves, parents)
+        bit1 = _pop_min(leaves, parents)
+        parents.append(Node(bit0=bit0, bit1=bit1))
+
+    if not leaves and not parents:
+        return None
+    return (leaves or parents)[0]
+
+def _pop_min(leaves, parents):
+    if not parents or (leaves and leaves[0].freq <= parents[0].freq):
+        return leaves.popleft()
+    return parents.popleft()
+
+def create_code_lengths(root):
+    lengths = [0] * 256
+    stack = [(root, 0)] if root is not None else []
+    while stack:
+        node, depth = stack.pop()
+        if node.bit0 is None:
+            lengths[node.symbol] = max(depth, 1)
+        else:
+            stack.append((node.bit0, depth + 1))
+            stack.append((node.bit1, depth + 1))
+    return lengths
+
+def create_limited_code_lengths(freqs, max_length):
+    # package-merge: оптимальные длины кодов, не превышающие max_length
+    leaves = [(frequency, (byte,)) for byte, frequency in sorted(freqs, key=lambda item: (item[1], item[0]))]
+    lengths = [0] * 256
+    if len(leaves) == 1:
+        lengths[leaves[0][1][0]] = 1
+        return lengths
+    if len(leaves) > 1 << max_length:
+        raise ValueError(f"{len(leaves)} symbols do not fit into {max_length}-bit codes")
+
+    packages = leaves
+    for _ in range(max_length - 1):
+        merged = [(packages[i][0] + packages[i + 1][0], packages[i][1] + packages[i + 1][1])
+                  for i in range(0, len(packages) - 1, 2)]
+        packages = sorted(leaves + merged, key=lambda item: item[0])
+
+    for _, symbols in packages[:2 * len(leaves) - 2]:
+        for byte in symbols:
+            lengths[byte] += 1
+    return lengths
+
+def create_canonical_code(lengths):
     codes = {}
-    _next(root, codes, "")
+    code = 0
+    prev_length = 0
+    for length, symbol in sorted((length, symbol) for symbol, length in enumerate(lengths) if length > 0):
+        code <<= length - prev_length
+        codes[symbol] = format(code, f'0{length}b')
+        code += 1
+        prev_length = length
     return codes
 
-def _next(node, codes, code):
-    if node.bit0 is None and node.bit1 is None:
-        codes[node.symbol] = code
-    else:
-        if node.bit0 is not None:
-            _next(node.bit0, codes, code + "0")
-        if node.bit1 is not None:
-            _next(node.bit1, codes, code + "1")
-
 def compress(data, codes):
-    bits = []
-    summ = 0
-    bit = 0 
-    for symbol in data:
-        for c in codes[symbol]:
-            if c == '1':
-                summ |= (1 << bit)
-            bit += 1
-            if bit == 8:
-                bits.append(summ)
-                summ = 0
-                bit = 0
-
-    if bit > 1:
-        bits.append(summ)
+    return compress_groups(data, [codes], [0], len(data) + 1)
+
+def compress_chunks(chunks, codes):
+    # куски кодируются по отдельности и склеиваются в один поток бит:
+    # недописанный последний байт куска переносится в следующий
+    code_lengths = [0] * 256
+    for symbol, code in codes.items():
+        code_lengths[symbol] = len(code)
+    buffer = 0
+    count = 0
+    for chunk in chunks:
+        buffer |= int.from_bytes(compress(chunk, codes), byteorder='little') << count
+        count += sum(length * frequency for length, frequency in zip(code_lengths, count_bytes(chunk)))
+        whole = count // 8
+        yield (buffer & ((1 << whole * 8) - 1)).to_bytes(whole, byteorder='little')
+        buffer >>= whole * 8
+        count -= whole * 8
+    yield buffer.to_bytes((count + 7) // 8, byteorder='little')
+
+def compress_groups(data, code_tables, selectors, group_size):
+    # коды хранятся целыми числами младшим битом вперёд; на длинных данных -
+    # сразу для пар символов, на коротких таблица пар дороже самого сжатия;
+    # группа g из group_size (чётного) символов кодируется таблицей selectors[g]
+    singles = []
+    for codes in code_tables:
+        single = [(0, 0)] * 256
+        for symbol, code in codes.items():
+            single[symbol] = (int(code[::-1], 2), len(code))
+        singles.append(single)
+
+    max_length = max(length for single in singles for _, length in single)
+    flush_bytes = FLUSH_BITS // 8
+    mask = (1 << FLUSH_BITS) - 1
+    bits = bytearray((len(data) * max_length + 7) // 8 + flush_bytes)
+    buffer = 0
+    count = 0
+    index = 0
+
+    if len(data) >= PAIR_TABLE_LENGTH:
+        tables = [[(code0 | (code1 << length0), length0 + length1)
+                   for code1, length1 in single for code0, length0 in single] for single in singles]
+        even_length = len(data) & ~1
+        units = array('H', bytes(data[:even_length]))
+        if sys.byteorder == 'big':
+            units.byteswap()
+        group_units = group_size // 2
+    else:
+        tables = singles
+        even_length = len(data)
+        units = data
+        group_units = group_size
+
+    for group, selector in enumerate(selectors):
+        table = tables[selector]
+        for unit in units[group * group_units:(group + 1) * group_units]:
+            code, length = table[unit]
+            buffer |= code << count
+            count += length
+            if count >= FLUSH_BITS:
+                bits[index:index + flush_bytes] = (buffer & mask).to_bytes(flush_bytes, byteorder='little')
+                buffer >>= FLUSH_BITS
+                count -= FLUSH_BITS
+                index += flush_bytes
+
+    if even_length < len(data):
+        code, length = singles[selectors[-1]][data[-1]]
+        buffer |= code << count
+        count += length
+
+    tail = (count + 7) // 8
+    bits[index:index + tail] = buffer.to_bytes(tail, byteorder='little')
+    del bits[index + tail:]
     return bits
 
 
@@ -150,65 +251,179 @@ def ha_decompress_file(arch_filename, output_filename):
         output_file.write(data)
 
 def decompress_bytes(arch):
-    data_length, start_index, freqs = parse_header(arch)
-    root = create_huffman_tree(freqs)
-    data = decompress(arch, start_index, data_length, root)
+    data_length, start_index, lengths = parse_header(arch)
+    if data_length == 0:
+        return b''
+    codes = create_canonical_code(lengths)
+    # на коротких архивах построение большой таблицы дороже самого декодирования
+    table_bits = min(TABLE_BITS, max(data_length.bit_length() - 2, 4))
+    data = decompress(arch, start_index, data_length, create_decode_table(codes, table_bits))
     return data
 
 def parse_header(arch):
+    if len(arch) < 4:
+        raise ValueError("Huffman header is truncated")
     data_length = (arch[0] |
                    (arch[1] << 8) |
                    (arch[2] << 16) |
                    (arch[3] << 24))
 
-    count = (arch[4] | (arch[5] << 8))
-    index = 6
-    freqs = {}
+    lengths, index = parse_code_lengths(arch, 4)
+    return data_length, index, lengths
 
-    for _ in range(count):
-        symbol = arch[index]
-        index += 1
-        frequency_first_byte = arch[index]
-        index += 1
+def parse_code_lengths(arch, index):
+    lengths = []
 
-        if frequency_first_byte == 255:
-            frequency = int.from_bytes(arch[index:index + 2], byteorder='little')
-            index += 2
-        elif frequency_first_byte == 254:
-            frequency = int.from_bytes(arch[index:index + 4], byteorder='little')
-            index += 4
+    while len(lengths) < 256:
+        if index >= len(arch):
+            raise ValueError("Huffman code lengths are truncated")
+        byte = arch[index]
+        index += 1
+        if byte & 0x80:
+            lengths.extend([0] * ((byte & 0x7F) + 1))
+        elif byte & 0x40:
+            if not lengths:
+                raise ValueError("Huffman code lengths start with a repeat")
+            lengths.extend([lengths[-1]] * ((byte & 0x3F) + 1))
+        else:
+            lengths.append(byte)
+
+    if len(lengths) > 256:
+        raise ValueError("Huffman code lengths overflow the alphabet")
+    return lengths, index
+
+def create_decode_table(codes, table_bits=TABLE_BITS):
+    # Таблица на 2**table_bits входов: по очередным битам потока (младший бит
+    # первый) сразу выдаёт все коды, целиком уместившиеся в окне, и число
+    # прочитанных бит. Коды длиннее окна уходят во вложенные таблицы по префиксу.
+    max_length = max(len(code) for code in codes.values())
+    single = _create_single_table(
+        [(symbol, len(code), int(code[::-1], 2)) for symbol, code in codes.items()], table_bits, 0)
+
+    table = []
+    for index in range(1 << table_bits):
+        symbols = bytearray()
+        used = 0
+        while True:
+            entry = single[index >> used]
+            if entry is None or entry[1] < 0 or used + entry[1] > table_bits:
+                break
+            symbols.append(entry[0])
+            used += entry[1]
+        if symbols:
+            table.append((bytes(symbols), used))
         else:
-            frequency = frequency_first_byte
+            table.append(single[index])
 
-        freqs[symbol] = frequency
-    start_index = index
-    return data_length, start_index, list(freqs.items())
+    return table, table_bits, max_length
 
-def decompress(arch, start_index, data_length, root):
-    size = 0
-    curr = root
-    data = bytearray()
+def _create_single_table(codes, table_bits, shift):
+    size = 1 << table_bits
+    table = [None] * size
+    long_codes = {}
+
+    for symbol, length, code in codes:
+        if length - shift <= table_bits:
+            for index in range(code, size, 1 << (length - shift)):
+                table[index] = (symbol, length)
+        else:
+            long_codes.setdefault(code & (size - 1), []).append((symbol, length, code >> table_bits))
 
-    if curr.bit0 is None and curr.bit1 is None:
-        data.append(curr.symbol)
-        return bytes(data)
+    for prefix, sub_codes in long_codes.items():
+        sub_bits = min(max(length for _, length, _ in sub_codes) - shift - table_bits, table_bits)
+        table[prefix] = (_create_single_table(sub_codes, sub_bits, shift + table_bits), -sub_bits)
 
-    for j in range(start_index, len(arch)):
-        for bit in range(8):
-            if (arch[j] & (1 << bit)) == 0:
-                curr = curr.bit0
-            else:
-                curr = curr.bit1
+    return table
 
-            if curr.bit0 is None and curr.bit1 is None:
-                data.append(curr.symbol)
-                size += 1
-                curr = root
-                if size == data_length:
-                    return bytes(data)
+def decompress(arch, start_index, data_length, decode_table):
+    _check_data_length(arch, start_index, data_length)
+    table, table_bits, max_length = decode_table
+    mask = (1 << table_bits) - 1
+    max_length = max(max_length, table_bits)
+    data = bytearray()
+    buffer = 0
+    count = 0
+    index = start_index
+
+    # неполный набор кодов оставляет в таблице пустые входы (None)
+    try:
+        while len(data) < data_length:
+            while count < max_length:
+                buffer |= int.from_bytes(arch[index:index + 8], byteorder='little') << count
+                index += 8
+                count += 64
+
+            symbols, length = table[buffer & mask]
+            if length < 0:
+                shift = table_bits
+                while length < 0:
+                    bits = -length
+                    symbols, length = symbols[(buffer >> shift) & ((1 << bits) - 1)]
+                    shift += bits
+                data.append(symbols)
+            else:
+                data += symbols
+            buffer >>= length
+            count -= length
+    except TypeError:
+        raise ValueError("invalid Huffman code") from None
+    # последний вход таблицы мог захватить коды из добивки до байта
+    _check_consumed(arch, start_index, index, count + table_bits)
+    del data[data_length:]
+    return bytes(data)
 
+def decompress_groups(arch, start_index, data_length, code_tables, selectors, group_size):
+    # группы декодируются посимвольно: многосимвольный вход таблицы мог бы
+    # перескочить в следующую группу с другой таблицей
+    _check_data_length(arch, start_index, data_length)
+    if len(selectors) * group_size < data_length:
+        raise ValueError("not enough Huffman table selectors")
+    decode_tables = [_create_single_table(
+        [(symbol, len(code), int(code[::-1], 2)) for symbol, code in codes.items()], TABLE_BITS, 0)
+        for codes in code_tables]
+    max_length = max(TABLE_BITS, max(len(code) for codes in code_tables for code in codes.values()))
+    mask = (1 << TABLE_BITS) - 1
+    data = bytearray(data_length)
+    position = 0
+    buffer = 0
+    count = 0
+    index = start_index
+
+    try:
+        for selector in selectors:
+            table = decode_tables[selector]
+            end = min(position + group_size, data_length)
+            while position < end:
+                if count < max_length:
+                    buffer |= int.from_bytes(arch[index:index + 8], byteorder='little') << count
+                    index += 8
+                    count += 64
+
+                symbol, length = table[buffer & mask]
+                if length < 0:
+                    shift = TABLE_BITS
+                    while length < 0:
+                        bits = -length
+                        symbol, length = symbol[(buffer >> shift) & ((1 << bits) - 1)]
+                        shift += bits
+                data[position] = symbol
+                position += 1
+                buffer >>= length
+                count -= length
+    except (TypeError, IndexError):
+        raise ValueError("invalid Huffman code or table selector") from None
+    _check_consumed(arch, start_index, index, count)
     return bytes(data)
 
+def _check_data_length(arch, start_index, data_length):
+    # на символ уходит хотя бы бит: иначе испорченная длина заставила бы
+    # декодировать нули за концом архива
+    if data_length > (len(arch) - start_index) * 8:
+        raise ValueError(f"Huffman data of {len(arch) - start_index} bytes cannot hold {data_length} symbols")
+
+def _check_consumed(arch, start_index, index, count):
+    if (index - start_index) * 8 - count > (len(arch) - start_index) * 8:
+        raise ValueError("Huffman data is truncated")
 
 
 if __name__ == "__main__":
@@ -1,95 +1,356 @@
-
-def compress_file(input_file_path, output_file_path, window_size, lookahead_buffer_size):
+from array import array
+from itertools import chain
+
+from HA import calculate_freqs, create_code_lengths, create_huffman_tree
+from SA import rank_array, suffix_array
+from VARINT import decode_varint, decode_varints, encode_varint, read_varint
+
+MIN_MATCH = 3
+HASH_MASK = 0x7FFF
+LEVEL_CHAINS = {1: 4, 2: 8, 3: 16, 4: 32, 5: 64, 6: 128, 7: 256, 8: 1024}
+DEFAULT_LEVEL = 5
+SUFFIX_ARRAY_LEVEL = 9
+NICE_LENGTH = 64
+FLAG_PRICE = 1
+LAZY_MARGIN = 2
+GREEDY = 'greedy'
+LAZY = 'lazy'
+OPTIMAL = 'optimal'
+STREAM_COUNT = 4
+CHUNK_SIZE = 1 << 20
+FLAG_BITS = [tuple((byte >> bit) & 1 for bit in range(8)) for byte in range(256)]
+
+def compress_file(input_file_path, output_file_path, window_size, lookahead_buffer_size, level=DEFAULT_LEVEL,
+                  parser=LAZY):
     with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
-        data = input_file.read()
-        compressed_data = lz77_compress(data, window_size, lookahead_buffer_size)
-        packed_data = pack_compressed_data(compressed_data)
-        output_file.write(packed_data)
+        # размер окна нужен распаковщику, чтобы хранить историю между блоками
+        output_file.write(encode_varint(window_size))
+        for compressed_data in lz77_compress_stream(input_file, window_size, lookahead_buffer_size, level, parser):
+            output_file.write(pack_compressed_data(compressed_data))
+
+def lz77_compress_stream(input_file, window_size, lookahead_buffer_size, level=DEFAULT_LEVEL, parser=LAZY,
+                         chunk_size=CHUNK_SIZE):
+    # файл читается кусками по chunk_size, из прошлых кусков хранятся только
+    # последние window_size байт; токены каждого куска отдаются сразу
+    history = b''
+    while True:
+        chunk = input_file.read(chunk_size)
+        if not chunk:
+            return
+        data = history + chunk
+        yield lz77_compress(data, window_size, lookahead_buffer_size, level, parser, start=len(history))
+        # при window_size == 0 срез [-0:] оставил бы весь файл
+        history = data[-window_size:] if window_size else b''
 
 def pack_compressed_data(compressed_data):
-    packed_data = bytearray()
-    for distance, length, next_char in compressed_data:
-        packed_data.extend(distance.to_bytes(2, 'little'))
-        packed_data.extend(length.to_bytes(2, 'little'))
-        packed_data.append(next_char)
+    # длина данных, число токенов и четыре потока, каждый со своим размером
+    data_length, streams = split_streams(compressed_data)
+    return pack_streams(data_length, len(compressed_data), streams)
+
+def pack_streams(data_length, count, streams):
+    packed_data = encode_varint(data_length)
+    packed_data += encode_varint(count)
+    for stream in streams:
+        packed_data += encode_varint(len(stream))
+        packed_data += stream
     return packed_data
 
-def lz77_compress(data, window_size, lookahead_buffer_size):
+def split_streams(compressed_data):
+    # флаги (бит на токен: 1 - есть совпадение), литералы всех токенов,
+    # varint длин (length - MIN_MATCH) и varint расстояний (distance - 1)
+    flags = bytearray((len(compressed_data) + 7) // 8)
+    literals = bytearray()
+    lengths = bytearray()
+    distances = bytearray()
+    data_length = 0
+
+    for k, (distance, length, next_char) in enumerate(compressed_data):
+        if length > 0:
+            flags[k >> 3] |= 1 << (k & 7)
+            lengths += encode_varint(length - MIN_MATCH)
+            distances += encode_varint(distance - 1)
+        literals.append(next_char)
+        data_length += length + 1
+
+    return data_length, [flags, literals, lengths, distances]
+
+def lz77_compress(data, window_size, lookahead_buffer_size, level=DEFAULT_LEVEL, parser=LAZY, start=0):
+    # data[:start] - уже сжатая история, на которую могут ссылаться совпадения
+    if level >= SUFFIX_ARRAY_LEVEL:
+        find_match = _suffix_array_finder(data, window_size, lookahead_buffer_size)
+    else:
+        find_match = _hash_chain_finder(data, window_size, lookahead_buffer_size, LEVEL_CHAINS[level])
+
+    if parser == OPTIMAL:
+        return _optimal_parse(data, find_match, start)
+    if parser not in (GREEDY, LAZY):
+        raise ValueError(f"unknown parser {parser!r}")
+
     compressed_data = []
-    i = 0
     n = len(data)
+    i = start
+    match = find_match(start) if n > start else None
 
     while i < n:
-        match_length = 0
-        match_distance = 0
+        match_length, match_distance = match
+        if parser == LAZY and match_length >= MIN_MATCH and i + 1 < n:
+            # ленивый разбор: если с i + 1 совпадение заметно длиннее, i уходит литералом;
+            # литерал занимает целый токен, поэтому нужен запас в LAZY_MARGIN байт
+            next_match = find_match(i + 1)
+            if next_match[0] > match_length + LAZY_MARGIN:
+                compressed_data.append((0, 0, data[i]))
+                i += 1
+                match = next_match
+                continue
+
+        compressed_data.append((match_distance, match_length, data[i + match_length]))
+        i += match_length + 1
+        if i < n:
+            match = find_match(i)
 
-        start = max(0, i - window_size)
-
-        for j in range(start, i):
-            length = 0
-            while (j + length < n and
-                   i + length < n and
-                   length < lookahead_buffer_size and
-                   data[j + length] == data[i + length]):
-                length += 1
-
-            if length > match_length:
-                match_length = length
-                match_distance = i - j
-
-        if match_length > 0:
-            next_char_index = i + match_length
-            next_char = data[next_char_index] if next_char_index < n else 0
-            compressed_data.append((match_distance, match_length, next_char))
-            i += match_length + 1
-        else:
-            compressed_data.append((0, 0, data[i]))
-            i += 1
+    return compressed_data
+
+def _optimal_parse(data, find_match, start):
+    # совпадения ищутся один раз для каждой позиции (внутри совпадений длиннее
+    # NICE_LENGTH поиск пропускается), затем два прохода динамики: первый
+    # минимизирует размер упакованных токенов, второй - цену по длинам кодов
+    # Хаффмана, которые получились бы у результата первого прохода
+    n = len(data)
+    match_lengths = array('i', bytes(4 * n))
+    match_distances = array('i', bytes(4 * n))
+    skip_until = 0
+    for i in range(start, n):
+        if i < skip_until:
+            match_lengths[i] = -1
+            continue
+        match_lengths[i], match_distances[i] = find_match(i)
+        if match_lengths[i] >= NICE_LENGTH:
+            skip_until = i + match_lengths[i] + 1
+
+    flat = [8] * 256
+    compressed_data = _parse_by_price(data, start, match_lengths, match_distances, flat, flat, flat)
+    _, (_, literals, lengths, distances) = split_streams(compressed_data)
+    return _parse_by_price(data, start, match_lengths, match_distances,
+                           _estimate_code_lengths(literals), _estimate_code_lengths(lengths),
+                           _estimate_code_lengths(distances))
+
+def _estimate_code_lengths(stream):
+    # байты, которых не было в первом проходе, считаются чуть дороже самых редких
+    code_lengths = create_code_lengths(create_huffman_tree(calculate_freqs(stream)))
+    unseen_length = max(code_lengths) + 1
+    return [length or unseen_length for length in code_lengths]
+
+def _parse_by_price(data, start, match_lengths, match_distances, literal_lengths, length_lengths, distance_lengths):
+    n = len(data)
+    unreachable = 1 << 62
+    cost = [unreachable] * (n + 1)
+    cost[start] = 0
+    from_position = array('i', bytes(4 * (n + 1)))
+    from_distance = array('i', bytes(4 * (n + 1)))
+    length_prices = [_varint_price(length_lengths, length - MIN_MATCH)
+                     for length in range(max(match_lengths, default=0) + 1)]
+
+    for i in range(start, n):
+        base = cost[i]
+        if base == unreachable:
+            continue
+
+        price = base + FLAG_PRICE + literal_lengths[data[i]]
+        if price < cost[i + 1]:
+            cost[i + 1] = price
+            from_position[i + 1] = i
+            from_distance[i + 1] = 0
+
+        longest = match_lengths[i]
+        if longest < MIN_MATCH:
+            continue
+        distance = match_distances[i]
+        base += FLAG_PRICE + _varint_price(distance_lengths, distance - 1)
+        for length in range(MIN_MATCH if longest < NICE_LENGTH else longest, longest + 1):
+            end = i + length + 1
+            price = base + length_prices[length] + literal_lengths[data[end - 1]]
+            if price < cost[end]:
+                cost[end] = price
+                from_position[end] = i
+                from_distance[end] = distance
 
+    compressed_data = []
+    end = n
+    while end > start:
+        token_start = from_position[end]
+        distance = from_distance[end]
+        if distance == 0:
+            compressed_data.append((0, 0, data[token_start]))
+        else:
+            compressed_data.append((distance, end - token_start - 1, data[end - 1]))
+        end = token_start
+    compressed_data.reverse()
     return compressed_data
 
+def _varint_price(code_lengths, value):
+    price = 0
+    while value >= 128:
+        price += code_lengths[(value & 127) | 128]
+        value >>= 7
+    return price + code_lengths[value]
 
+def _hash_chain_finder(data, window_size, lookahead_buffer_size, max_chain):
+    # хеш-цепочки трёхбайтовых префиксов: head[h] - последняя позиция с хешем h,
+    # prev - предыдущая позиция с тем же хешем; просматривается не больше max_chain позиций
+    n = len(data)
+    ring_size = 1 << window_size.bit_length()
+    ring_mask = ring_size - 1
+    head = array('i', [-1]) * (HASH_MASK + 1)
+    prev = array('i', [-1]) * ring_size
+    inserted = 0
+
+    def find_match(i):
+        nonlocal inserted
+        end = min(i, n - 2)
+        while inserted < end:
+            h = ((data[inserted] << 10) ^ (data[inserted + 1] << 5) ^ data[inserted + 2]) & HASH_MASK
+            prev[inserted & ring_mask] = head[h]
+            head[h] = inserted
+            inserted += 1
+
+        limit = min(lookahead_buffer_size, n - i - 1)
+        if limit < MIN_MATCH:
+            return 0, 0
 
-def decompress_file(input_file_path, output_file_path):
-    with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
+        match_length = 0
+        match_distance = 0
+        j = head[((data[i] << 10) ^ (data[i + 1] << 5) ^ data[i + 2]) & HASH_MASK]
+        chain = max_chain
+        while j >= 0 and i - j <= window_size and chain > 0:
+            if data[j + match_length] == data[i + match_length]:
+                length = _match_length(data, j, i, limit)
+                if length > match_length:
+                    match_length = length
+                    match_distance = i - j
+                    if length == limit:
+                        break
+            j = prev[j & ring_mask]
+            chain -= 1
+
+        if match_length < MIN_MATCH:
+            return 0, 0
+        return match_length, match_distance
+
+    return find_match
+
+def _suffix_array_finder(data, window_size, lookahead_buffer_size):
+    # точный поиск: позиции окна отмечены в active по рангам суффиксов, и самое
+    # длинное совпадение даёт ближайший слева или справа по рангу суффикс из окна
+    n = len(data)
+    sa = suffix_array(data)
+    rank = rank_array(sa)
+    active = bytearray(n)
+    inserted = 0
+
+    def find_match(i):
+        nonlocal inserted
+        while inserted < i:
+            active[rank[inserted]] = 1
+            if inserted >= window_size:
+                active[rank[inserted - window_size]] = 0
+            inserted += 1
+
+        limit = min(lookahead_buffer_size, n - i - 1)
+        if limit < MIN_MATCH:
+            return 0, 0
 
-        data = input_file.read()
-        compressed_data = parse_compressed_data(data)
-        decompressed_data = lz77_decompress(compressed_data)
-        output_file.write(decompressed_data)
+        match_length = 0
+        match_distance = 0
+        r = rank[i]
+        for neighbour in (active.rfind(1, 0, r), active.find(1, r + 1)):
+            if neighbour >= 0:
+                j = sa[neighbour]
+                length = _match_length(data, j, i, limit)
+                if length > match_length or (length == match_length and i - j < match_distance):
+                    match_length = length
+                    match_distance = i - j
 
-def parse_compressed_data(compressed_data):
-    packed_data = []
-    i = 0
-    n = len(compressed_data)
+        if match_length < MIN_MATCH:
+            return 0, 0
+        return match_length, match_distance
 
-    while i < n:
-        if i + 4 >= n:
-            break
+    return find_match
 
-        match_distance = compressed_data[i] | (compressed_data[i + 1] << 8)
-        match_length = compressed_data[i + 2] | (compressed_data[i + 3] << 8)
-        next_char = compressed_data[i + 4]
+def _match_length(data, i, j, limit):
+    length = 0
+    while length + 32 <= limit and data[i + length:i + length + 32] == data[j + length:j + length + 32]:
+        length += 32
+    while length < limit and data[i + length] == data[j + length]:
+        length += 1
+    return length
 
-        packed_data.append((match_distance, match_length, next_char))
-        i += 5
-    return packed_data
 
-def lz77_decompress(compressed_data):
-    decompressed_data = bytearray()
 
-    for distance, length, next_char in compressed_data:
-        if distance == 0 and length == 0:
-            decompressed_data.append(next_char)
+def decompress_file(input_file_path, output_file_path):
+    with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
+
+        # блоки читаются по одному, между ними хранится только окно
+        window_size = read_varint(input_file)
+        history = b''
+        while True:
+            block = read_streams(input_file)
+            if block is None:
+                break
+            data_length, count, streams = block
+            decompressed_data = lz77_decompress(join_streams(count, streams), data_length, history)
+            output_file.write(decompressed_data)
+            history = (history + decompressed_data)[-window_size:] if window_size else b''
+
+def read_streams(input_file):
+    data_length = read_varint(input_file)
+    if data_length is None:
+        return None
+    count = read_varint(input_file)
+    streams = [input_file.read(read_varint(input_file)) for _ in range(STREAM_COUNT)]
+    return data_length, count, streams
+
+def join_streams(count, streams):
+    flags, literals, lengths, distances = streams
+    flags = chain.from_iterable(map(FLAG_BITS.__getitem__, flags))
+    lengths = iter(decode_varints(lengths))
+    distances = iter(decode_varints(distances))
+
+    compressed_data = []
+    for has_match, next_char in zip(flags, literals[:count]):
+        if has_match:
+            compressed_data.append((next(distances) + 1, next(lengths) + MIN_MATCH, next_char))
         else:
-            start_index = len(decompressed_data) - distance
-            for j in range(length):
-                decompressed_data.append(decompressed_data[start_index + j])
-            if next_char == 0: break
-            decompressed_data.append(next_char)
+            compressed_data.append((0, 0, next_char))
+    return compressed_data
 
-    return bytes(decompressed_data)
+def lz77_decompress(compressed_data, data_length=None, history=b''):
+    # выходной буфер выделяется сразу, если известен размер данных;
+    # совпадения копируются срезами, перекрывающиеся - удвоением образца;
+    # history - хвост предыдущих блоков, на который ссылаются совпадения
+    if data_length is None:
+        data_length = sum(length + 1 for _, length, _ in compressed_data)
+    decompressed_data = bytearray(history)
+    decompressed_data += bytes(data_length)
+    position = len(history)
 
+    for distance, length, next_char in compressed_data:
+        if length:
+            start_index = position - distance
+            if distance >= length:
+                decompressed_data[position:position + length] = decompressed_data[start_index:start_index + length]
+            else:
+                copied = distance
+                decompressed_data[position:position + distance] = decompressed_data[start_index:position]
+                while copied < length:
+                    chunk = min(copied, length - copied)
+                    decompressed_data[position + copied:position + copied + chunk] = \
+                        decompressed_data[position:position + chunk]
+                    copied += chunk
+            position += length
+        decompressed_data[position] = next_char
+        position += 1
+
+    return bytes(decompressed_data[len(history):])
 
 
 if __name__ == "__main__":
@@ -97,7 +358,7 @@ if __name__ == "__main__":
     compressed_file = 'compressed.lz77'
     decompressed_file = 'decompressed'
 
-    compress_file(input_file, compressed_file, 500, 400)
+    compress_file(input_file, compressed_file, 32768, 258)
     print(f"Файл '{input_file}' сжат в '{compressed_file}'.")
 
     decompress_file(compressed_file, decompressed_file)
@@ -1,66 +1,204 @@
-def encode_varint(value):
-    result = bytearray()
-    while value >= 128:
-        result.append((value & 127) | 128)
-        value >>= 7
-    result.append(value)
-    return result
-
-def decode_varint(data):
-    value = 0
-    shift = 0
-    i = 0
-    while True:
-        byte = data[i]
-        value |= (byte & 127) << shift
-        i += 1
-        if byte < 128:
-            break
-        shift += 7
-    return value, i
-
-def compress_file(input_file_path, output_file_path):
+from heapq import heapify, heappop, heappush
+
+from VARINT import decode_varint, encode_varint
+
+FREEZE = 'freeze'
+RESET = 'reset'
+LRU = 'lru'
+POLICIES = (FREEZE, RESET, LRU)
+MAX_ENTRIES = 1 << 16
+DEFAULT_POLICY = LRU
+OUTPUT_BATCH = 1 << 20
+BYTES = [bytes([byte]) for byte in range(256)]
+
+class PhraseDictionary:
+    # словарь фраз, общий для сжатия и распаковки: trie[parent << 8 | byte] -
+    # номер фразы, keys[номер] - её ключ; номера меньше roots заняты неявными
+    # фразами (пустой в LZ78, однобайтовыми в LZW); когда фраз max_entries,
+    # словарь по политике замораживается, очищается или вытесняет лист,
+    # дольше всех не использованный
+    __slots__ = ('max_entries', 'policy', 'roots', 'trie', 'keys', 'children', 'stamps', 'clock', 'leaves')
+
+    def __init__(self, max_entries=MAX_ENTRIES, policy=DEFAULT_POLICY, roots=1):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown dictionary policy {policy!r}")
+        self.max_entries = max_entries
+        self.policy = policy
+        self.roots = roots
+        self.trie = {}
+        self.keys = [None] * roots
+        self.children = [0] * roots
+        # stamps[номер] - время последнего использования фразы, leaves - куча
+        # (время, номер) листьев; устаревшие записи отбрасываются при чтении
+        self.stamps = [0] * roots
+        self.clock = 0
+        self.leaves = []
+
+    def is_full(self):
+        return bool(self.max_entries) and len(self.keys) - self.roots >= self.max_entries
+
+    def next_index(self, parent):
+        # номер, который получит следующая фраза с префиксом parent, или 0
+        if not self.is_full():
+            return len(self.keys)
+        if self.policy == LRU:
+            leaves = self.leaves
+            self._drop_stale()
+            if not leaves:
+                return 0
+            if leaves[0][1] != parent:
+                return leaves[0][1]
+            top = heappop(leaves)
+            self._drop_stale()
+            victim = leaves[0][1] if leaves else 0
+            heappush(leaves, top)
+            return victim
+        return 0
+
+    def next_size(self):
+        # размер keys после следующего add, какой бы ни была фраза
+        if not self.is_full():
+            return len(self.keys) + 1
+        if self.policy == RESET:
+            return self.roots
+        return len(self.keys)
+
+    def add(self, key):
+        # возвращает номер новой фразы или 0, если фраза не добавлена
+        parent = key >> 8
+        if self.policy == LRU:
+            # префикс новой фразы только что выдан кодером - это и есть её использование
+            self.clock += 1
+            self.stamps[parent] = self.clock
+        if self.is_full():
+            if self.policy == FREEZE:
+                return 0
+            if self.policy == RESET:
+                # новая фраза ссылалась бы на номер из старого словаря
+                self.trie.clear()
+                del self.keys[self.roots:]
+                return 0
+            # вытесняется только лист, иначе потерялись бы продолжения фразы
+            victim = self.next_index(parent)
+            if not victim:
+                # parent остался листом, но с новым временем
+                if parent >= self.roots:
+                    heappush(self.leaves, (self.clock, parent))
+                return 0
+            self._evict(victim)
+            return self._insert(key, parent, victim)
+
+        self.keys.append(key)
+        if self.policy == LRU:
+            self.children.append(0)
+            self.stamps.append(0)
+        return self._insert(key, parent, len(self.keys) - 1)
+
+    def _insert(self, key, parent, index):
+        self.trie[key] = index
+        self.keys[index] = key
+        if self.policy == LRU:
+            if parent >= self.roots:
+                self.children[parent] += 1
+            self.stamps[index] = self.clock
+            heappush(self.leaves, (self.clock, index))
+            if len(self.leaves) > 2 * len(self.keys):
+                self.leaves = [leaf for leaf in self.leaves if self._is_leaf(*leaf)]
+                heapify(self.leaves)
+        return index
+
+    def _evict(self, index):
+        key = self.keys[index]
+        del self.trie[key]
+        parent = key >> 8
+        if parent >= self.roots:
+            # фраза использовалась не позже своих продолжений
+            self.stamps[parent] = max(self.stamps[parent], self.stamps[index])
+            self.children[parent] -= 1
+            if self.children[parent] == 0:
+                heappush(self.leaves, (self.stamps[parent], parent))
+
+    def _is_leaf(self, stamp, index):
+        return self.stamps[index] == stamp and self.children[index] == 0
+
+    def _drop_stale(self):
+        leaves = self.leaves
+        while leaves and not self._is_leaf(*leaves[0]):
+            heappop(leaves)
+
+def compress_file(input_file_path, output_file_path, max_entries=MAX_ENTRIES, policy=DEFAULT_POLICY):
     with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
-        dictionary = {b"": 0}
-        buffer = bytearray()
-        for chunk in iter(lambda: input_file.read(4096), b""):
-            for char in chunk:
-                byte_char = bytes([char])
-                current_prefix = bytes(buffer + byte_char)
-
-                if current_prefix in dictionary:
-                    buffer += byte_char
+        lz78_compress(input_file, output_file, max_entries, policy)
+
+def lz78_compress(input_file, output_file, max_entries=MAX_ENTRIES, policy=DEFAULT_POLICY):
+    dictionary = PhraseDictionary(max_entries, policy)
+
+    # заголовок: политика и предел словаря (0 - без предела)
+    output_file.write(bytes([POLICIES.index(policy)]) + encode_varint(max_entries or 0))
+
+    # словарь - префиксное дерево: фраза node, продолженная байтом char,
+    # лежит в trie под ключом node << 8 | char; 0 - пустая фраза
+    trie = dictionary.trie
+    node = 0
+    for chunk in iter(lambda: input_file.read(4096), b""):
+        output = bytearray()
+        for char in chunk:
+            key = node << 8 | char
+            child = trie.get(key)
+            if child is not None:
+                node = child
+            else:
+                if node < 128:
+                    output.append(node)
                 else:
-                    index = dictionary.get(bytes(buffer), 0)
-                    output_file.write(encode_varint(index))
-                    output_file.write(byte_char)
-                    dictionary[current_prefix] = len(dictionary)
-                    buffer = bytearray()
+                    output += encode_varint(node)
+                output.append(char)
+                dictionary.add(key)
+                node = 0
+        output_file.write(output)
 
-        if buffer:
-            index = dictionary.get(bytes(buffer), 0)
-            output_file.write(encode_varint(index))
-            output_file.write(b"")
+    if node:
+        output_file.write(encode_varint(node))
 
 def decompress_file(input_file_path, output_file_path):
     with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
-        dictionary = [b""]
-        i = 0
-        input_data = input_file.read()
-        while i < len(input_data):
-            index, offset = decode_varint(input_data[i:])
-            i+=offset
-            value = input_data[i:i+1]
-            i+=1
-
-            if index == 0:
-                entry = value
-            else:
-                entry = dictionary[index] + value
-
-            output_file.write(entry)
-            dictionary.append(entry)
-
+        for batch in lz78_decompress(input_file.read()):
+            output_file.write(batch)
+
+def lz78_decompress(input_data):
+    # выход отдаётся кусками по OUTPUT_BATCH байт; словарь распаковщика
+    # повторяет все изменения словаря кодера и хранит байты живых фраз,
+    # так что память ограничена словарём, а не длиной выхода
+    policy = POLICIES[input_data[0]]
+    max_entries, i = decode_varint(input_data, 1)
+    dictionary = PhraseDictionary(max_entries, policy)
+    phrases = [b'']
+    output = bytearray()
+    n = len(input_data)
+    while i < n:
+        index = input_data[i]
+        if index < 128:
+            i += 1
+        else:
+            index, i = decode_varint(input_data, i)
+
+        if i < n:
+            char = input_data[i]
+            i += 1
+            phrase = phrases[index] + BYTES[char]
+            new_index = dictionary.add(index << 8 | char)
+            if new_index == len(phrases):
+                phrases.append(phrase)
+            elif new_index:
+                phrases[new_index] = phrase
+        else:
+            phrase = phrases[index]
+        output += phrase
+        if len(output) >= OUTPUT_BATCH:
+            yield bytes(output)
+            output.clear()
+
+    yield bytes(output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+from LZ78 import BYTES, DEFAULT_POLICY, OUTPUT_BATCH, POLICIES, PhraseDictionary
+
+MIN_BITS = 9
+MAX_BITS = 16
+FLUSH_BITS = 512
+
+def compress_file(input_file_path, output_file_path, max_bits=MAX_BITS, policy=DEFAULT_POLICY):
+    if not MIN_BITS <= max_bits <= 24:
+        raise ValueError(f"code width must be between {MIN_BITS} and 24 bits, got {max_bits}")
+    # коды 0..255 - сами байты, новые фразы получают коды с 256, пока не
+    # кончатся max_bits-битные номера
+    dictionary = PhraseDictionary((1 << max_bits) - 256, policy, roots=256)
+    with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
+        output_file.write(bytes([POLICIES.index(policy), max_bits]))
+        chunk = input_file.read(4096)
+        if not chunk:
+            return
+
+        # коды пишутся младшим битом вперёд; ширина кода - по наибольшему
+        # существующему номеру, но не меньше MIN_BITS
+        trie = dictionary.trie
+        keys = dictionary.keys
+        flush_bytes = FLUSH_BITS // 8
+        mask = (1 << FLUSH_BITS) - 1
+        width = MIN_BITS
+        buffer = 0
+        count = 0
+        node = chunk[0]
+        chunk = chunk[1:]
+        while True:
+            output = bytearray()
+            for char in chunk:
+                key = node << 8 | char
+                child = trie.get(key)
+                if child is not None:
+                    node = child
+                    continue
+                buffer |= node << count
+                count += width
+                if count >= FLUSH_BITS:
+                    output += (buffer & mask).to_bytes(flush_bytes, byteorder='little')
+                    buffer >>= FLUSH_BITS
+                    count -= FLUSH_BITS
+                dictionary.add(key)
+                width = max(MIN_BITS, (len(keys) - 1).bit_length())
+                node = char
+            output_file.write(output)
+            chunk = input_file.read(4096)
+            if not chunk:
+                break
+
+        buffer |= node << count
+        count += width
+        output_file.write(buffer.to_bytes((count + 7) // 8, byteorder='little'))
+
+
+
+def decompress_file(input_file_path, output_file_path):
+    with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
+        input_data = input_file.read()
+        if not input_data:
+            return
+        policy = POLICIES[input_data[0]]
+        max_bits = input_data[1]
+        if not MIN_BITS <= max_bits <= 24:
+            raise ValueError(f"code width must be between {MIN_BITS} and 24 bits, got {max_bits}")
+        dictionary = PhraseDictionary((1 << max_bits) - 256, policy, roots=256)
+
+        # словарь хранит байты живых фраз, выход пишется кусками по
+        # OUTPUT_BATCH байт; новая фраза - предыдущая фраза и первый байт текущей
+        phrases = BYTES[:]
+        output = bytearray()
+        buffer = 0
+        count = 0
+        index = 2
+        remaining = (len(input_data) - index) * 8
+        prev = -1
+        prev_phrase = b''
+        width = MIN_BITS
+        pending = 0
+
+        # хвост потока короче MIN_BITS - это выравнивание до байта
+        while remaining >= width:
+            while count < width:
+                buffer |= int.from_bytes(input_data[index:index + 8], byteorder='little') << count
+                index += 8
+                count += 64
+            code = buffer & ((1 << width) - 1)
+            buffer >>= width
+            count -= width
+            remaining -= width
+
+            if code == pending and code >= 256:
+                # фраза ещё не добавлена: предыдущая фраза и её же первый байт
+                phrase = prev_phrase + prev_phrase[:1]
+            else:
+                phrase = phrases[code]
+
+            if prev >= 0:
+                new_index = dictionary.add(prev << 8 | phrase[0])
+                if new_index == len(phrases):
+                    phrases.append(prev_phrase + phrase[:1])
+                elif new_index:
+                    phrases[new_index] = prev_phrase + phrase[:1]
+            output += phrase
+            if len(output) >= OUTPUT_BATCH:
+                output_file.write(output)
+                output.clear()
+            prev = code
+            prev_phrase = phrase
+            width = max(MIN_BITS, (dictionary.next_size() - 1).bit_length())
+            pending = dictionary.next_index(prev)
+
+        output_file.write(output)
+
+
+if __name__ == "__main__":
+    input_file = 'russian_text.txt'
+    compressed_file = 'compressed.lzw'
+    decompressed_file = 'decompressed'
+
+    compress_file(input_file, compressed_file)
+    print(f"Файл '{input_file}' сжат в '{compressed_file}'.")
+
+    decompress_file(compressed_file, decompressed_file)
+    print(f"Файл '{compressed_file}' восстановлен в '{decompressed_file}'.")
+
+
+    ############################ проверка на идентичность
+    import filecmp
+
+
+    def files_are_identical(file1, file2):
+        return filecmp.cmp(file1, file2, shallow=False)
+
+    file1 = 'russian_text.txt'
+    file2 = 'decompressed'
+
+    if files_are_identical(file1, file2):
+        print("Файлы идентичны.")
+    else:
+        print("Файлы различаются.")
@@ -0,0 +1,129 @@
+from collections import Counter
+
+from HA import (compress_bytes, compress_groups, count_bytes, create_canonical_code, create_limited_code_lengths,
+                decompress_bytes, decompress_groups, pack_code_lengths, parse_code_lengths)
+from MTF import mtf_compress, mtf_decompress, zero_run_compress, zero_run_decompress
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GROUP_SIZE = 50
+MAX_TABLES = 6
+TABLE_ITERATIONS = 4
+MAX_GROUP_CODE_LENGTH = 17
+TABLE_DATA_LENGTH = 5000
+
+def compress_bytes_multi(data):
+    # несколько таблиц Хаффмана: данные режутся на группы по GROUP_SIZE символов,
+    # каждая группа кодируется той таблицей, что даёт для неё меньше бит;
+    # таблицы несколько раз переобучаются на группах, которые им достались.
+    # Первый байт - число таблиц; с одной таблицей дальше идёт обычный архив HA
+    tables = _table_count(len(data))
+    if tables == 1:
+        return bytes([1]) + bytes(compress_bytes(data))
+
+    counts = count_bytes(data)
+    group_counts = _count_groups(data)
+    lengths_list = _initial_code_lengths(counts, tables)
+    for _ in range(TABLE_ITERATIONS):
+        selectors = _select_tables(group_counts, lengths_list)
+        lengths_list = [create_limited_code_lengths(
+            [(byte, count + 1) for byte, count in enumerate(table_counts) if counts[byte]], MAX_GROUP_CODE_LENGTH)
+            for table_counts in _table_counts(group_counts, selectors, len(lengths_list))]
+    selectors = _select_tables(group_counts, lengths_list)
+
+    # таблицы, которые не достались ни одной группе, в архив не попадают, а
+    # остальные строятся заново ровно по символам своих групп
+    used = sorted(set(selectors))
+    if len(used) == 1:
+        return bytes([1]) + bytes(compress_bytes(data))
+    selectors = [used.index(selector) for selector in selectors]
+    lengths_list = [create_limited_code_lengths(
+        [(byte, count) for byte, count in enumerate(table_counts) if count], MAX_GROUP_CODE_LENGTH)
+        for table_counts in _table_counts(group_counts, selectors, len(used))]
+
+    head = bytearray([len(lengths_list)])
+    head += len(data).to_bytes(4, byteorder='little')
+    for lengths in lengths_list:
+        head += pack_code_lengths(lengths)
+    # соседние группы обычно берут одну таблицу: MTF и серии нулей сводят
+    # такие повторы почти к нулю бит
+    selectors_arch = compress_bytes(zero_run_compress(mtf_compress(bytes(selectors))))
+    head += len(selectors_arch).to_bytes(4, byteorder='little')
+    head += selectors_arch
+    bits = compress_groups(data, [create_canonical_code(lengths) for lengths in lengths_list], selectors, GROUP_SIZE)
+
+    return bytes(head + bits)
+
+def _table_count(data_length):
+    # каждая таблица в заголовке стоит порядка сотни байт
+    return max(1, min(MAX_TABLES, data_length // TABLE_DATA_LENGTH))
+
+def _initial_code_lengths(counts, tables):
+    # алфавит делится на tables отрезков с примерно равной суммарной частотой;
+    # символы своего отрезка таблица считает дешёвыми
+    lengths_list = []
+    remaining = sum(counts)
+    symbol = 0
+    for table in range(tables):
+        target = remaining // (tables - table)
+        low = symbol
+        taken = 0
+        while symbol < 256 and (taken < target or taken == 0):
+            taken += counts[symbol]
+            symbol += 1
+        remaining -= taken
+        lengths_list.append([0 if low <= byte < symbol else MAX_GROUP_CODE_LENGTH for byte in range(256)])
+    return lengths_list
+
+def _count_groups(data):
+    groups = (len(data) + GROUP_SIZE - 1) // GROUP_SIZE
+    if np is not None and isinstance(data, (bytes, bytearray, memoryview)):
+        symbols = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+        group_ids = np.arange(len(symbols), dtype=np.int64) // GROUP_SIZE
+        return np.bincount(group_ids * 256 + symbols, minlength=groups * 256).reshape(groups, 256)
+    return [Counter(data[start:start + GROUP_SIZE]) for start in range(0, len(data), GROUP_SIZE)]
+
+def _select_tables(group_counts, lengths_list):
+    if np is not None and isinstance(group_counts, np.ndarray):
+        costs = group_counts @ np.array(lengths_list, dtype=np.int64).T
+        return costs.argmin(axis=1).tolist()
+    selectors = []
+    for counts in group_counts:
+        costs = [sum(lengths[byte] * count for byte, count in counts.items()) for lengths in lengths_list]
+        selectors.append(costs.index(min(costs)))
+    return selectors
+
+def _table_counts(group_counts, selectors, tables):
+    if np is not None and isinstance(group_counts, np.ndarray):
+        table_counts = np.zeros((tables, 256), dtype=np.int64)
+        np.add.at(table_counts, np.array(selectors), group_counts)
+        return table_counts.tolist()
+    table_counts = [[0] * 256 for _ in range(tables)]
+    for counts, selector in zip(group_counts, selectors):
+        for byte, count in counts.items():
+            table_counts[selector][byte] += count
+    return table_counts
+
+
+
+def decompress_bytes_multi(arch):
+    if not arch:
+        raise ValueError("multi-table Huffman data is empty")
+    tables = arch[0]
+    if tables == 1:
+        return decompress_bytes(arch[1:])
+    data_length = int.from_bytes(arch[1:5], byteorder='little')
+    index = 5
+    code_tables = []
+    for _ in range(tables):
+        lengths, index = parse_code_lengths(arch, index)
+        code_tables.append(create_canonical_code(lengths))
+    selectors_length = int.from_bytes(arch[index:index + 4], byteorder='little')
+    index += 4
+    groups = (data_length + GROUP_SIZE - 1) // GROUP_SIZE
+    selectors = mtf_decompress(zero_run_decompress(decompress_bytes(arch[index:index + selectors_length]), groups))
+    index += selectors_length
+    return decompress_groups(arch, index, data_length, code_tables, selectors, GROUP_SIZE)
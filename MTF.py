@@ -0,0 +1,85 @@
+import re
+
+RUNA = 0
+RUNB = 1
+ESCAPE = 255
+SHIFT_UP = bytes(min(s + 1, 255) for s in range(256))
+SHIFT_DOWN = bytes(max(s - 1, 0) for s in range(256))
+ZERO_RUN = re.compile(rb'\x00+')
+CODED_TOKEN = re.compile(rb'[\x00\x01]+|\xff.', re.S)
+
+def mtf_compress(data, alphabet_size=256):
+    # таблица - bytearray, символ переезжает в начало одним сдвигом среза
+    table = bytearray(range(alphabet_size))
+    rezult = bytearray(len(data))
+    for k, s in enumerate(data):
+        if table[0] == s:
+            continue
+        i = table.index(s)
+        rezult[k] = i
+        table[1:i + 1] = table[:i]
+        table[0] = s
+    return bytes(rezult)
+
+def mtf_decompress(L, alphabet_size=256):
+    table = bytearray(range(alphabet_size))
+    rezult = bytearray(len(L))
+    for k, i in enumerate(L):
+        s = table[i]
+        rezult[k] = s
+        if i:
+            table[1:i + 1] = table[:i]
+            table[0] = s
+    return bytes(rezult)
+
+def zero_run_compress(mtf_data):
+    # серии нулей записываются длиной в биективной двоичной системе цифрами
+    # RUNA (1) и RUNB (2), остальные значения сдвигаются на 1; 254 и 255 не
+    # влезают в байт после сдвига и идут через ESCAPE
+    rezult = bytearray()
+    position = 0
+    for run in ZERO_RUN.finditer(mtf_data):
+        _append_symbols(rezult, mtf_data[position:run.start()])
+        length = run.end() - run.start()
+        while length:
+            if length & 1:
+                rezult.append(RUNA)
+                length = (length - 1) >> 1
+            else:
+                rezult.append(RUNB)
+                length = (length - 2) >> 1
+        position = run.end()
+    _append_symbols(rezult, mtf_data[position:])
+    return bytes(rezult)
+
+def _append_symbols(rezult, symbols):
+    if 254 in symbols or 255 in symbols:
+        for s in symbols:
+            if s >= 254:
+                rezult.append(ESCAPE)
+                rezult.append(s - 254)
+            else:
+                rezult.append(s + 1)
+    else:
+        rezult += symbols.translate(SHIFT_UP)
+
+def zero_run_decompress(data, data_length=None):
+    # data_length - ожидаемая длина выхода: испорченная серия не должна
+    # развернуться в гигабайты нулей
+    rezult = bytearray()
+    position = 0
+    for token in CODED_TOKEN.finditer(data):
+        rezult += data[position:token.start()].translate(SHIFT_DOWN)
+        symbols = token.group()
+        if symbols[0] == ESCAPE:
+            rezult.append(254 + symbols[1])
+        else:
+            length = 0
+            for digit, s in enumerate(symbols):
+                length += (s + 1) << digit
+            if data_length is not None and len(rezult) + length > data_length:
+                raise ValueError(f"zero run overflows the expected {data_length} bytes")
+            rezult += bytes(length)
+        position = token.end()
+    rezult += data[position:].translate(SHIFT_DOWN)
+    return bytes(rezult)
@@ -1,3 +1,5 @@
+from VARINT import decode_varint, encode_varint, read_varint
+
 def compress_file(input_file_path, output_file_path, block_size):
     with open(input_file_path, 'rb') as input_file, open(output_file_path, 'wb') as output_file:
         while True:
@@ -8,18 +10,12 @@ def compress_file(input_file_path, output_file_path, block_size):
 
             for flag, count, symbol in code_block:
                 output_file.write(bytes([flag]))
-                write_variable_length_integer(output_file, count)
+                output_file.write(encode_varint(count))
                 if flag == 1:
                     output_file.write(bytes([symbol]))
                 else:
                     output_file.write(symbol)
 
-def write_variable_length_integer(file, value):
-    while value > 127:
-        file.write(bytes([(value & 127) | 128]))
-        value >>= 7
-    file.write(bytes([value]))
-
 def rle_compress(data):
     result = []
     i = 0
@@ -56,7 +52,7 @@ def decompress_file(input_file_path, output_file_path, block_size):
                     return
 
                 flag = flag[0]
-                count = read_variable_length_integer(input_file)
+                count = read_varint(input_file)
 
                 if flag == 1:
                     symbol_bytes = input_file.read(1)
@@ -78,19 +74,27 @@ def decompress_file(input_file_path, output_file_path, block_size):
 
             output_file.write(bytes(decompressed_block))
 
-def read_variable_length_integer(file):
-    value = 0
-    shift = 0
-    while True:
-        byte = file.read(1)
-        if not byte:
-            return None
-        byte = byte[0]
-        value |= (byte & 127) << shift
-        shift += 7
-        if byte & 128 == 0:
-            break
-    return value
+def rle_decode(data, index, length):
+    # тройки из data с позиции index, пока не наберётся length байт
+    decompressed_data = bytearray()
+    try:
+        while len(decompressed_data) < length:
+            flag = data[index]
+            index += 1
+            count, index = decode_varint(data, index)
+            if len(decompressed_data) + count > length:
+                raise ValueError(f"RLE run overflows the expected {length} bytes")
+            if flag == 1:
+                decompressed_data.extend(bytes([data[index]]) * count)
+                index += 1
+            else:
+                if index + count > len(data):
+                    raise ValueError("RLE data is truncated")
+                decompressed_data += data[index:index + count]
+                index += count
+    except IndexError:
+        raise ValueError("RLE data is truncated") from None
+    return bytes(decompressed_data), index
 
 
 
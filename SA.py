@@ -0,0 +1,76 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def suffix_array(data, cyclic=False):
+    # удвоение префиксов: на шаге k суффиксы упорядочены по первым 2k байтам,
+    # ключ - пара рангов (i, i + k); при cyclic сортируются циклические сдвиги
+    if len(data) == 0:
+        return array('i')
+    if np is not None:
+        return _suffix_array_numpy(data, cyclic)
+    return _suffix_array_python(data, cyclic)
+
+def rank_array(sa):
+    if np is not None:
+        rank = np.empty(len(sa), dtype=np.int32)
+        rank[np.frombuffer(sa, dtype=np.int32)] = np.arange(len(sa), dtype=np.int32)
+        return array('i', rank.tobytes())
+
+    rank = array('i', bytes(4 * len(sa)))
+    for r, position in enumerate(sa):
+        rank[position] = r
+    return rank
+
+def _suffix_array_numpy(data, cyclic):
+    n = len(data)
+    rank = np.frombuffer(bytes(data), dtype=np.uint8).astype(np.int64)
+    base = max(n, 256) + 1
+    k = 1
+
+    while True:
+        if cyclic:
+            second = np.roll(rank, -k) + 1
+        else:
+            second = np.zeros(n, dtype=np.int64)
+            second[:n - k] = rank[k:] + 1
+        key = rank * base + second
+        sa = np.argsort(key, kind='stable')
+        sorted_key = key[sa]
+        sorted_rank = np.zeros(n, dtype=np.int64)
+        np.cumsum(sorted_key[1:] != sorted_key[:-1], out=sorted_rank[1:])
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = sorted_rank
+
+        k *= 2
+        if sorted_rank[-1] == n - 1 or k >= n:
+            return array('i', sa.astype(np.int32).tobytes())
+
+def _suffix_array_python(data, cyclic):
+    n = len(data)
+    rank = list(data)
+    sa = list(range(n))
+    base = max(n, 256) + 1
+    k = 1
+
+    while True:
+        if cyclic:
+            key = [rank[i] * base + rank[(i + k) % n] + 1 for i in range(n)]
+        else:
+            key = [rank[i] * base + rank[i + k] + 1 for i in range(n - k)]
+            key += [rank[i] * base for i in range(max(n - k, 0), n)]
+        sa.sort(key=key.__getitem__)
+
+        classes = 0
+        rank[sa[0]] = 0
+        for r in range(1, n):
+            if key[sa[r]] != key[sa[r - 1]]:
+                classes += 1
+            rank[sa[r]] = classes
+
+        k *= 2
+        if classes == n - 1 or k >= n:
+            return array('i', sa)
@@ -0,0 +1,55 @@
+# целые числа по 7 бит в байте, младшие первыми; старший бит - продолжение
+
+def encode_varint(value):
+    result = bytearray()
+    while value >= 128:
+        result.append((value & 127) | 128)
+        value >>= 7
+    result.append(value)
+    return result
+
+def decode_varint(data, index):
+    value = 0
+    shift = 0
+    while True:
+        if index >= len(data):
+            raise ValueError("truncated varint")
+        byte = data[index]
+        index += 1
+        value |= (byte & 127) << shift
+        if byte < 128:
+            return value, index
+        shift += 7
+
+def read_varint(input_file):
+    # None - если файл кончился до начала числа
+    value = 0
+    shift = 0
+    while True:
+        byte = input_file.read(1)
+        if not byte:
+            if shift:
+                raise EOFError("truncated varint")
+            return None
+        value |= (byte[0] & 127) << shift
+        if byte[0] < 128:
+            return value
+        shift += 7
+
+def decode_varints(data):
+    # поток без продолжений - это просто байты
+    if max(data, default=0) < 128:
+        return list(data)
+
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 127) << shift
+        if byte < 128:
+            values.append(value)
+            value = 0
+            shift = 0
+        else:
+            shift += 7
+    return values
@@ -1,6 +1,8 @@
 import heapq
 from heapq import heappop, heappush
 
+from MTF import mtf_compress, mtf_decompress
+
 def isLeaf(root):
     return root.left is None and root.right is None
 
@@ -134,23 +136,10 @@ def counting_sort_arg(S):
 
 
 def MTF(S):
-    T = [chr(i) for i in range(128)]
-    T_str = "".join(T)
-    L = []
-    for s in S:
-        i = T_str.index(s)
-        L.append(i)
-        T_str = T_str[i] + T_str[:i] + T_str[i+1:]
-    return L
+    return list(mtf_compress(bytes(map(ord, S)), 128))
 
 def iMTF(L):
-    T = [chr(i) for i in range(128)]
-    T_str = "".join(T)
-    S_new = ""
-    for i in L:
-        S_new += T_str[i]
-        T_str = T_str[i] + T_str[:i] + T_str[i + 1:]
-    return S_new
+    return mtf_decompress(L, 128).decode('ascii')
 
 
 